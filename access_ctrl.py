@@ -1,4 +1,5 @@
 import configparser
+from functools import lru_cache
 
 class AccessController:
     """
@@ -9,8 +10,10 @@ class AccessController:
         self.roles = []
         self.resources = []
         self.permissions = []
+        self._table = {}
         self.framework_specific_check = None
         self.load_config(config_file)
+        self._cached_is_allowed = lru_cache(maxsize=1024)(self._lookup)
 
     def load_config(self, config_file: str):
         """Loads the access control configuration from a file.
@@ -37,6 +40,18 @@ class AccessController:
         if len(self.permissions) != len(self.roles) or any(len(row) != len(self.resources) for row in self.permissions):
             raise ValueError("Invalid permissions matrix: must match the number of roles and resources")
 
+        # flatten the matrix into role -> allowed resources for constant time lookups
+        self._table = {
+            role: frozenset(resource for resource, allowed in zip(self.resources, row) if allowed == 1)
+            for role, row in zip(self.roles, self.permissions)
+        }
+
+        if hasattr(self, '_cached_is_allowed'):
+            self._cached_is_allowed.cache_clear()
+
+    def _lookup(self, role: str, resource: str):
+        return resource in self._table.get(role, ())
+
     def is_allowed(self, role: str, resource: str):
         """Enforces the access control policy. returns true if resource is accessible to role, false otherwise.
 
@@ -45,11 +60,4 @@ class AccessController:
             resource (str): The resource to be accessed. Must be one of the values defined in the configuration file.
         """
 
-        # allows access to everyone for now.
-        # update this to enforce the access control policy.
-
-        if self.permissions[self.roles.index(role)][self.resources.index(resource)] == 1:
-            return True
-        else:
-            return False
-        
\ No newline at end of file
+        return self._cached_is_allowed(role, resource)
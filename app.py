@@ -1,19 +1,25 @@
-from fastapi import FastAPI, Request, Form, HTTPException, Cookie, Depends, status
+from fastapi import FastAPI, Request, Form, HTTPException, Cookie, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware 
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import APIKeyCookie
 
 import datetime
 import os
+import time
 import oracledb
-import requests
-import uvicorn
+import httpx
 import jwt
-import json
-
-import uuid
-import redis 
+import orjson
+
+import secrets
+import hashlib
+from functools import lru_cache
+import redis.asyncio as aioredis
+import jinja2
+from cachetools import TTLCache, TLRUCache
 from util import get_bill_data
 
 # for implementing Access Control
@@ -21,7 +27,8 @@ from access_ctrl import AccessController
 
 # Oracle client libraries for thick mode
 ORACLE_HOME = os.environ.get("ORACLE_HOME")               # Defined by the file `oic_setup.sh`.
-oracledb.init_oracle_client(lib_dir=ORACLE_HOME)          # Thick mode
+if ORACLE_HOME:
+    oracledb.init_oracle_client(lib_dir=ORACLE_HOME)      # Thick mode, otherwise the default thin mode is used
 
 
 # These environment variables come from `env.sh` file.
@@ -29,6 +36,10 @@ user_name = os.environ.get("DB_USERNAME")
 user_pswd = os.environ.get("DB_PASSWORD")
 db_alias  = os.environ.get("DB_ALIAS")
 
+# per worker connection pool size. every server worker opens its own pool, so the database sees up to workers x DB_POOL_MAX sessions.
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 4))
+
 # OAuth config
 OAUTH_REDIRECT_ENDPOINT = "callback"
 SECRET_KEY = os.environ.get("SECRET_KEY")
@@ -45,14 +56,33 @@ SESSION_DURATION = datetime.timedelta(seconds = 15)
 # will be used for communication
 AUTH_SERVER_IP = os.environ.get("AUTH_SERVER_IP")
 HOST_IP = os.environ.get("HOST_IP")
+REDIRECT_URI = f"https://{HOST_IP}/{OAUTH_REDIRECT_ENDPOINT}"
 
 # make sure to setup connection with the DATABASE SERVER FIRST. refer to python-oracledb documentation for more details on how to connect, and run sql queries and PL/SQL procedures.
-connection = oracledb.connect(user=user_name, password=user_pswd, dsn=db_alias)
+# a pool of connections is kept so that concurrent requests do not serialize on a single DB session.
+# the pool is created on startup so that every server worker gets its own.
+db_pool = None
+
+def _with_connection(fn, *args):
+    conn = db_pool.acquire()
+    try:
+        return fn(conn, *args)
+    finally:
+        db_pool.release(conn)
 
-#initiate redis instance
-redis_db = redis.StrictRedis(host = 'localhost', port = 6379, db = 0, decode_responses = True)
+async def run_db(fn, *args):
+    """Runs fn(conn, *args) in the threadpool. The connection is acquired and released by the same thread call,
+    so a request waiting on the pool never holds a thread that a connection holder needs to finish."""
+    return await run_in_threadpool(_with_connection, fn, *args)
+
+#initiate redis instance. the asyncio client keeps redis I/O from blocking the event loop.
+redis_pool = aioredis.ConnectionPool(host = 'localhost', port = 6379, db = 0, decode_responses = True, max_connections = 50)
+redis_db = aioredis.Redis(connection_pool = redis_pool)
+
+# shared http client for talking to the auth server. connections are kept alive across requests.
+http_client = httpx.AsyncClient(verify = False, timeout = 5.0)
 # App server config
-app = FastAPI()
+app = FastAPI(default_response_class = ORJSONResponse)
 origins = ['*']
 app.add_middleware(
     CORSMiddleware,
@@ -62,7 +92,53 @@ app.add_middleware(
     allow_headers=["*"],
 ) 
 app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+# compiled templates are cached as bytecode on disk, and auto reload is off so templates are not re-checked on every render.
+templates_env = jinja2.Environment(
+    loader = jinja2.FileSystemLoader("templates"),
+    bytecode_cache = jinja2.FileSystemBytecodeCache(),     # private per-user cache directory, not shared /tmp
+    auto_reload = False,
+    autoescape = jinja2.select_autoescape(),
+)
+templates = Jinja2Templates(env = templates_env)
+
+@app.on_event("startup")
+def open_db_pool():
+    global db_pool
+    db_pool = oracledb.create_pool(user=user_name, password=user_pswd, dsn=db_alias, min=DB_POOL_MIN, max=DB_POOL_MAX, increment=1, getmode=oracledb.POOL_GETMODE_TIMEDWAIT, wait_timeout=5000, stmtcachesize=50)
+
+@app.on_event("startup")
+def warm_templates():
+    # compile every template before traffic arrives
+    for name in templates_env.list_templates():
+        templates_env.get_template(name)
+
+@app.on_event("shutdown")
+def close_db_pool():
+    db_pool.close()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+# the protected pages only differ by role, so the role and the templates' last modification time identify their content.
+TEMPLATE_MTIME = int(max(os.path.getmtime(os.path.join("templates", name)) for name in templates_env.list_templates()))
+
+def render_cached_page(request: Request, user: dict, name: str):
+    """Renders a role dependent page, or returns 304 if the client already has the current version."""
+    etag = f'W/"{user["role"]}-{TEMPLATE_MTIME}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=10"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code = 304, headers = headers)
+
+    return templates.TemplateResponse(name, {"request": request, "user": user}, headers = headers)
+
+# the index page context only depends on process constants, so it is built once.
+INDEX_TMPL = templates.get_template("index.html")
+INDEX_CTX = {
+    "auth_server": AUTH_SERVER_IP,
+    "client_id": CLIENT_ID,
+    "redirect_uri": REDIRECT_URI,
+}
 
 # Access Control setup
 access_ctrl = AccessController("access.cfg")
@@ -70,7 +146,6 @@ access_ctrl = AccessController("access.cfg")
 # -----------------------------
 # -----------------------------
 
-SESSIONS = {}
 # API Endpoints
 # -----------------------------
 # -----------------------------
@@ -84,14 +159,9 @@ SESSIONS = {}
 # These endpoints are accessible to all users, irrespective of their roles and the authentication status.
 @app.get("/", response_class=HTMLResponse)
 async def get_index(request: Request):
-    return templates.TemplateResponse("index.html",
-                                        {
-                                            "request": request,
-                                            "auth_server": AUTH_SERVER_IP,
-                                            "client_id": CLIENT_ID,
-                                            "redirect_uri": f"https://{HOST_IP}/{OAUTH_REDIRECT_ENDPOINT}"
-                                        })
+    return HTMLResponse(INDEX_TMPL.render(request = request, **INDEX_CTX))
 
+@lru_cache(maxsize = 4096)
 def get_role(username):
     if username.endswith("_u1"):
         return "customer"
@@ -100,21 +170,50 @@ def get_role(username):
     if username.endswith("_u3"):
         return "disco_employee"
 
-async def validate_session(session_token: str | None = Cookie(default=None)):
-    if not session_token:
-        raise HTTPException(status_code = 401, detail = "Not authenticated. Session token missing")
+# decoded JWT payloads keyed by the token hash. an entry is kept for at most 10 seconds, and never past the token's `exp`,
+# so an expired token is always decoded again and rejected.
+def _jwt_ttu(token_hash, payload, now):
+    return min(now + 10, payload.get("exp", now + 10))
+
+_jwt_cache = TLRUCache(maxsize = 10_000, ttu = _jwt_ttu, timer = time.time)
+
+def verify_token(jwt_token):
+    token_hash = hashlib.sha256(jwt_token.encode()).digest()
+    payload = _jwt_cache.get(token_hash)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(jwt_token, SECRET_KEY, algorithms = [ALGORITHM])
+    _jwt_cache[token_hash] = payload
+    return payload
+
+def session_key(session_id):
+    return f"sess:{session_id}"
+
+# extracts the session cookie, rejecting requests that do not carry one
+session_cookie = APIKeyCookie(name = SESSION_COOKIE_NAME)
+
+# local cache of validated sessions in front of redis. the ttl must stay below the session duration so that expiry still takes effect.
+# the cache is per worker: after a sign-out, workers other than the one handling it keep accepting the token for up to the ttl (5 s).
+_session_cache = TTLCache(maxsize = 10_000, ttl = 5)
+
+async def validate_session(session_token: str = Depends(session_cookie)):
+    cached = _session_cache.get(session_token)
+    if cached is not None:
+        username, role = cached
+        return {"username": username, "role": role}
     
-    session_payload = redis_db.get(session_token)
+    session_payload = await redis_db.hgetall(session_key(session_token))
     if not session_payload:
         raise HTTPException(status_code = 401, detail = "Token has expired")
 
-    session_payload = json.loads(session_payload)
-    username = session_payload["username"]
+    username = session_payload.get("username")
     
     if not username:
         raise HTTPException(status_code = 401, detail = "Username missing in session token")
     
     role = get_role(username)
+    _session_cache[session_token] = (username, role)
     
     return {"username": username, "role": role}
 
@@ -132,27 +231,31 @@ async def getAccessToken(request: Request, code: str | None = None):
     }
 
     try:
-        response = requests.post(token_url, data = token_data, verify = False)
+        response = await http_client.post(token_url, data = token_data)
         response.raise_for_status()
-        token_info = response.json()
+        token_info = orjson.loads(response.content)
         jwt_token = token_info.get("token")
         if not jwt_token:
             raise HTTPException(status_code = 401, detail = "Failed to retrieve token.")
         
-        decoded_token = jwt.decode(jwt_token, SECRET_KEY, algorithms = [ALGORITHM])
+        decoded_token = verify_token(jwt_token)
         username = decoded_token.get("sub")
         if not username:
             raise HTTPException(status_code = 401, detail = "Invalid Token: Missing Username")
         
 
-        session_id = str(uuid.uuid4())
+        session_id = secrets.token_urlsafe(16)
 
         session_payload = {
             "username": username,
-            "role": None,
+            "role": "",
         }
 
-        redis_db.setex(session_id, 15, json.dumps(session_payload))
+        # all session writes go out in a single round trip.
+        async with redis_db.pipeline(transaction = False) as pipe:
+            pipe.hset(session_key(session_id), mapping = session_payload)
+            pipe.expire(session_key(session_id), 15)
+            await pipe.execute()
     
         redirect_response = RedirectResponse(url = "/dashboard", status_code = 302)
         redirect_response.set_cookie(
@@ -165,7 +268,7 @@ async def getAccessToken(request: Request, code: str | None = None):
         )
         return redirect_response
 
-    except requests.exceptions.RequestException as e:
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
         raise HTTPException(status_code = 500, detail = f"Error fetching token: {str(e)}")
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code = 401, detail = "Token has expired")
@@ -179,15 +282,17 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
     if exc.status_code == 401 and exc.detail == "Token has expired":
         return RedirectResponse(url = "https://168.138.178.200", status_code = 302)
 
-    return JSONResponse(status_code = exc.status_code, content = {"detail": exc.detail})
+    return ORJSONResponse(status_code = exc.status_code, content = {"detail": exc.detail})
 
 #manual signout endpoint which clears cookie and deletes token
 @app.get("/sign-out")
-async def sign_out(request: Request, session_token: str | None = Cookie(default = None)):
-    # Remove the token from the SESSIONS dictionary if it exists.
+async def sign_out(request: Request, background_tasks: BackgroundTasks, session_token: str | None = Cookie(default = None)):
+    # Remove the session if it exists. UNLINK frees the key off the redis main thread, and it runs after the redirect is sent.
+    # only this worker's session cache is cleared; other workers may still accept the token until their cache entry expires.
 
     if session_token:
-        redis_db.delete(session_token)
+        _session_cache.pop(session_token, None)
+        background_tasks.add_task(redis_db.unlink, session_key(session_token))
 
     response = RedirectResponse(url = "https://168.138.178.200", status_code = 302)
     
@@ -199,7 +304,7 @@ async def sign_out(request: Request, session_token: str | None = Cookie(default
 # dashboard is accessible to all authenticated users. we dont need to however change dashboard according to the user role, as it is a generic page.
 @app.get("/dashboard", response_class=HTMLResponse)
 async def get_dashboard(request: Request, user: dict = Depends(validate_session)):
-    return templates.TemplateResponse("dashboard.html", {"request": request, "user": user})
+    return render_cached_page(request, user, "dashboard.html")
 
 # TODO: Implement the access control logic for all the endpoints below
 
@@ -209,7 +314,7 @@ async def get_bill_payment(request: Request, user: dict = Depends(validate_sessi
     function = "/bill-payment"
     if not access_ctrl.is_allowed(user["role"], function):
         raise HTTPException(status_code = 403, detail = "Forbidden")
-    return templates.TemplateResponse("bill_payment.html", {"request": request, "user": user})
+    return render_cached_page(request, user, "bill_payment.html")
 
 # Bill generation page
 @app.get("/bill-retrieval", response_class=HTMLResponse)
@@ -217,7 +322,7 @@ async def get_bill_retrieval(request: Request, user: dict = Depends(validate_ses
     function = "/bill-retrieval"
     if not access_ctrl.is_allowed(user["role"], function):
         raise HTTPException(status_code = 403, detail = "Forbidden")
-    return templates.TemplateResponse("bill_retrieval.html", {"request": request, "user": user})
+    return render_cached_page(request, user, "bill_retrieval.html")
 
 # Adjustments page
 @app.get("/bill-adjustments", response_class=HTMLResponse)
@@ -225,7 +330,7 @@ async def get_bill_adjustment(request: Request, user: dict = Depends(validate_se
     function = "/bill-adjustment"
     if not access_ctrl.is_allowed(user["role"], function):
         raise HTTPException(status_code = 403, detail = "Forbidden")
-    return templates.TemplateResponse("bill_adjustments.html", {"request": request, "user": user})
+    return render_cached_page(request, user, "bill_adjustments.html")
 
 # ------------------------------------------------
 # ---------- POST methods for the pages ----------
@@ -233,34 +338,103 @@ async def get_bill_adjustment(request: Request, user: dict = Depends(validate_se
 
 # These endpoints are the ones implementing the actual business logic, and are also protected by the access control logic.
 
-@app.post("/bill-payment", response_class=HTMLResponse)
-async def post_bill_payment(request: Request, bill_id: int = Form(...), amount: float = Form(...), payment_method_id: int = Form(...)):
+# checks that the bill exists, processes the payment and fetches the payment status and method description.
+# fun_process_Payment returns 1 if the payment is successful, and 0 otherwise. (currently no support for error codes)
+PAYMENT_BLOCK = """
+DECLARE
+    v_bill_count NUMBER;
+    v_status NUMBER;
+BEGIN
+    SELECT COUNT(*) INTO v_bill_count FROM BILL B WHERE B.BILLID = :bill_id;
+    :bill_found := v_bill_count;
+    IF v_bill_count > 0 THEN
+        v_status := fun_process_Payment(:bill_id, :payment_date, :payment_method_id, :amount);
+        :status := v_status;
+        IF v_status = 1 THEN
+            -- pooled connections roll back open transactions on release, so the payment is committed before the receipt is read
+            COMMIT;
+            OPEN :receipt FOR
+                SELECT
+                    (SELECT PD.PaymentStatus FROM PAYMENTDETAILS PD WHERE PD.BILLID = :bill_id AND ROWNUM = 1),
+                    (SELECT PaymentMethodDescription FROM PaymentMethods WHERE PaymentMethodID = :payment_method_id AND ROWNUM = 1)
+                FROM DUAL;
+        END IF;
+    END IF;
+END;
+"""
+
+# The database calls below are blocking, so the handlers run them in the threadpool to keep the event loop free.
+
+def _process_payment(conn, bill_id, payment_date, payment_method_id, amount):
+    cursor = conn.cursor()
+
+    bill_found = cursor.var(int)
+    status = cursor.var(int)
+    # the receipt is returned as a ref cursor so the columns keep their native types. its row is prefetched with the execute.
+    receipt = cursor.var(oracledb.DB_TYPE_CURSOR)
+
+    # validate the bill, process the payment and read back the receipt details in a single round trip
+    cursor.execute(PAYMENT_BLOCK, {
+        "bill_id": bill_id,
+        "payment_date": payment_date,
+        "payment_method_id": payment_method_id,
+        "amount": amount,
+        "bill_found": bill_found,
+        "status": status,
+        "receipt": receipt,
+    })
+
+    paymentstatus, pd_description = None, None
+    if status.getvalue() == 1:
+        paymentstatus, pd_description = receipt.getvalue().fetchone()
 
-    # try:
-    cursor = connection.cursor()
+    return bill_found.getvalue(), status.getvalue(), paymentstatus, pd_description
+
+def _process_adjustment(conn, adjustment_id, bill_id, adjustment_date, officer_name, officer_designation, original_bill_amount, adjustment_amount, adjustment_reason):
+    """Validates the bill and applies the adjustment on one connection. Returns an error message, or None on success."""
+    cursor = conn.cursor()
 
     # check if the bill exists
-    bill_query = f"SELECT B.BILLID FROM BILL B WHERE B.BILLID = {bill_id}"
-    cursor.execute(bill_query)
+    bill_query = "SELECT B.BILLID, B.TotalAmount_BeforeDueDate FROM BILL B WHERE B.BILLID = :bill_id"
+    cursor.execute(bill_query, {"bill_id": bill_id})
     bill_row = cursor.fetchone()
 
     if not bill_row:
-        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "Invalid BillID provided."})
-    
+        return "Invalid BillID provided."
+
+    amount_due = bill_row[1]
+
+    if original_bill_amount != amount_due:
+        return "The original bill amount provided does not match the actual amount due."
+
+    # check if the bill is unpaid so far
+    paymentstatus_query = "SELECT PD.PaymentStatus FROM PAYMENTDETAILS PD WHERE PD.BILLID = :bill_id"
+    cursor.execute(paymentstatus_query, {"bill_id": bill_id})
+    paymentstatus = cursor.fetchone()[0]
+
+    if paymentstatus:
+        return "The bill has already been paid. Adjustments cannot be made to a paid bill."
+
+    result = cursor.callfunc("fun_adjust_Bill", int, [adjustment_id, bill_id, adjustment_date, officer_name, officer_designation, original_bill_amount, adjustment_amount, adjustment_reason])
+    if result != 1:
+        return "An error occured while processing the request. Please try again. Make sure the values are correct"
+
+    # pooled connections roll back open transactions on release, so a successful adjustment is committed here
+    conn.commit()
+    return None
+
+@app.post("/bill-payment", response_class=HTMLResponse)
+async def post_bill_payment(request: Request, bill_id: int = Form(...), amount: float = Form(...), payment_method_id: int = Form(...)):
+
     payment_date = datetime.datetime.now()
 
-    # This function processes the payment in the database. It returns 1 if the payment is successful, and 0 otherwise. (currently no support for error codds)
-    status = cursor.callfunc("fun_process_Payment", int, [bill_id, payment_date, payment_method_id, amount])
+    bill_found, status, paymentstatus, pd_description = await run_db(_process_payment, bill_id, payment_date, payment_method_id, amount)
+
+    if not bill_found:
+        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "Invalid BillID provided."})
 
     if status != 1:
         return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "An error occured while processing the request. Please try again. Make sure the values are correct"})
-    
-    # find the payment status and the outstanding amount
-    paymentstatus_query = f"SELECT PD.PaymentStatus FROM PAYMENTDETAILS PD WHERE PD.BILLID = {bill_id}"
-    cursor.execute(paymentstatus_query)
-    paymentstatus = cursor.fetchone()[0]
-
-    pd_description = cursor.execute(f"SELECT PaymentMethodDescription FROM PaymentMethods WHERE PaymentMethodID = {payment_method_id}").fetchone()[0]
 
     payment_details = {
         "bill_id": bill_id,
@@ -277,30 +451,33 @@ async def post_bill_payment(request: Request, bill_id: int = Form(...), amount:
 async def post_bill_retrieval(request: Request, customer_id: str = Form(...), connection_id: str = Form(...), month: str = Form(...), year: str = Form(...)):
 
     try:
-        customer_data, connections_data, bill_data, tariffs_data1, tariffs_data2, tariffs_data3, taxes_data, subsidy_data, ff_data, bills_prev_data = get_bill_data(connection, customer_id, connection_id, month, year)
+        customer_data, connections_data, bill_data, tariffs_data1, tariffs_data2, tariffs_data3, taxes_data, subsidy_data, ff_data, bills_prev_data = await run_db(get_bill_data, customer_id, connection_id, month, year)
+
+        iso = datetime.date.isoformat
+        bill_amount = bill_data.amount_before_due_date
 
         bill_details = {
             "customer_id": customer_id,
             "connection_id": connection_id,
-            "customer_name": f"{customer_data[0]} {customer_data[1]}",
-            "customer_address": customer_data[2],
-            "customer_phone": customer_data[3],
-            "customer_email": customer_data[4],
-            "connection_type": connections_data[0],
-            "division": connections_data[1],
-            "subdivision": connections_data[2],
-            "installation_date": connections_data[3].strftime("%Y-%m-%d"),
-            "meter_type": connections_data[4],
-            "issue_date": bill_data[0].strftime("%Y-%m-%d"),
-            "net_peak_units": bill_data[1],
-            "net_off_peak_units": bill_data[2],
-            "bill_amount": bill_data[7],
-            "due_date": bill_data[6].strftime("%Y-%m-%d"),
-            "amount_after_due_date": bill_data[8],
+            "customer_name": f"{customer_data.first_name} {customer_data.last_name}",
+            "customer_address": customer_data.address,
+            "customer_phone": customer_data.phone,
+            "customer_email": customer_data.email,
+            "connection_type": connections_data.connection_type,
+            "division": connections_data.division,
+            "subdivision": connections_data.subdivision,
+            "installation_date": iso(connections_data.installation_date),
+            "meter_type": connections_data.meter_type,
+            "issue_date": iso(bill_data.issue_date),
+            "net_peak_units": bill_data.net_peak_units,
+            "net_off_peak_units": bill_data.net_off_peak_units,
+            "bill_amount": bill_amount,
+            "due_date": iso(bill_data.due_date),
+            "amount_after_due_date": bill_data.amount_after_due_date,
             "month": month,
-            "arrears_amount": bill_data[5],
-            "fixed_fee_amount": bill_data[4],
-            "tax_amount": bill_data[3],
+            "arrears_amount": bill_data.arrears,
+            "fixed_fee_amount": bill_data.fixed_fee,
+            "tax_amount": bill_data.tax_amount,
             # all the applicable tariffs
             "tariffs": [
                 {"name": tariffs_data2[0], "units": tariffs_data1[0], "rate": tariffs_data2[1], "amount": tariffs_data1[2]},
@@ -308,22 +485,22 @@ async def post_bill_retrieval(request: Request, customer_id: str = Form(...), co
             ],
             # applicable taxes
             "taxes": [
-                {"name": row[0], "rate": row[1], "amount": row[1]*bill_data[7]}
-                for row in taxes_data
+                {"name": name, "rate": rate, "amount": rate*bill_amount}
+                for name, rate in taxes_data
             ],
             # applicable subsidies
             "subsidies": [
-                {"name": row[0], "provider_name": row[2], "rate_per_unit": row[1]}
-                for row in subsidy_data
+                {"name": name, "provider_name": provider_name, "rate_per_unit": rate_per_unit}
+                for name, rate_per_unit, provider_name in subsidy_data
             ],
             # applicable fixed fees
             "fixed_fee": [
-                {"name": row[0], "amount": row[1]}
-                for row in ff_data
+                {"name": name, "amount": amount}
+                for name, amount in ff_data
             ],
             # the last 10 (or lesser) bills of the customer
             "bills_prev": [
-                {"month": f"{row[1]}-{row[0]}", "amount": row[2], "due_date": row[3].strftime("%Y-%m-%d"), "status": row[4]}
+                {"month": f"{row.year}-{row.month}", "amount": row.amount, "due_date": iso(row.due_date), "status": row.status}
                 for row in bills_prev_data
             ]
         }
@@ -344,37 +521,16 @@ async def post_bill_adjustments(
     adjustment_amount: float = Form(...),
     adjustment_reason: str = Form(...)
 ):
-    cursor = connection.cursor()
-
-    # check if the bill exists
-    bill_query = f"SELECT B.BILLID, B.TotalAmount_BeforeDueDate FROM BILL B WHERE B.BILLID = {bill_id}"
-    cursor.execute(bill_query)
-    bill_row = cursor.fetchone()
-
-    if not bill_row:
-        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "Invalid BillID provided."})
-    
-    amount_due = bill_row[1]
-
-    if original_bill_amount != amount_due:
-        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "The original bill amount provided does not match the actual amount due."})
-    
-    # check if the bill is unpaid so far
-    paymentstatus_query = f"SELECT PD.PaymentStatus FROM PAYMENTDETAILS PD WHERE PD.BILLID = {bill_id}"
-    cursor.execute(paymentstatus_query)
-    paymentstatus = cursor.fetchone()[0]
-
-    if paymentstatus:
-        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "The bill has already been paid. Adjustments cannot be made to a paid bill."})
-
     # current date as the payment date
     adjustment_DATE = datetime.datetime.now()
 
     # generate an adjustment id
-    adjustment_id = int(str(bill_id) + str(adjustment_DATE.year) + str(adjustment_DATE.month))
-    print(adjustment_id)
+    adjustment_id = bill_id * 1_000_000 + adjustment_DATE.year * 100 + adjustment_DATE.month
+
+    error_msg = await run_db(_process_adjustment, adjustment_id, bill_id, adjustment_DATE, officer_name, officer_designation, original_bill_amount, adjustment_amount, adjustment_reason)
 
-    result = cursor.callfunc("fun_adjust_Bill", int, [adjustment_id, bill_id, adjustment_DATE, officer_name, officer_designation, original_bill_amount, adjustment_amount, adjustment_reason])
+    if error_msg:
+        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": error_msg})
 
     adjustment_details = {
         "bill_id": bill_id,
@@ -387,8 +543,5 @@ async def post_bill_adjustments(
         "confirmation_number": adjustment_id
     }
 
-    if result == 1:
-        return templates.TemplateResponse("adjustment_receipt.html", {"request": request, "adjustment_details": adjustment_details})
-    else:
-        return templates.TemplateResponse(request=request, name="error.html", context={"error_msg": "An error occured while processing the request. Please try again. Make sure the values are correct"})
+    return templates.TemplateResponse("adjustment_receipt.html", {"request": request, "adjustment_details": adjustment_details})
 
@@ -0,0 +1,14 @@
+# Gunicorn config for running the app server with multiple uvicorn workers.
+# usage: gunicorn app:app -c gunicorn.conf.py
+import multiprocessing
+import os
+
+# every worker opens its own database pool of up to DB_POOL_MAX connections (see app.py), so keep workers x DB_POOL_MAX
+# within the database's session limit.
+workers = int(os.environ.get("WEB_CONCURRENCY", 2 * multiprocessing.cpu_count() + 1))
+
+# uvicorn picks uvloop as the event loop automatically when it is installed.
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# access logging is disabled as it adds a write per request.
+accesslog = None
@@ -1,7 +1,15 @@
+from collections import namedtuple
+
+# row types returned by get_bill_data, so that callers can read columns by name
+CustomerRow = namedtuple("CustomerRow", "first_name last_name address phone email")
+ConnectionRow = namedtuple("ConnectionRow", "connection_type division subdivision installation_date meter_type")
+BillRow = namedtuple("BillRow", "issue_date net_peak_units net_off_peak_units tax_amount fixed_fee arrears due_date amount_before_due_date amount_after_due_date")
+PrevBillRow = namedtuple("PrevBillRow", "month year amount due_date status")
+
 def get_bill_data(connection, customer_id, connection_id, month, year):
     cursor = connection.cursor()
 
-    test_query = f"""
+    test_query = """
     SELECT
     *
     FROM
@@ -9,54 +17,57 @@ def get_bill_data(connection, customer_id, connection_id, month, year):
         JOIN CONNECTIONS C
         ON CUSTOMERS.CUSTOMERID = C.CUSTOMERID
     WHERE
-        C.CUSTOMERID = '{customer_id}'
-        and c.connectionid = '{connection_id}'
+        C.CUSTOMERID = :customer_id
+        and c.connectionid = :connection_id
     """
 
-    cursor.execute(test_query)
+    cursor.execute(test_query, {'customer_id': customer_id, 'connection_id': connection_id})
     test_data = cursor.fetchone()
 
     if not test_data:
         raise Exception("Customer or connection ID not found")
 
-    customer_query = f"""
+    customer_query = """
     select FirstName, LastName, Address, PhoneNumber, Email
     from customers
-    where customerid = '{customer_id}'
+    where customerid = :customer_id
     """
 
-    cursor.execute(customer_query)
+    cursor.execute(customer_query, {'customer_id': customer_id})
+    cursor.rowfactory = CustomerRow
     customer_data = cursor.fetchone()
 
-    connections_query = f"""
+    connections_query = """
     select ct.description, d.divisionname, d.subdivname, con.installationdate, con.metertype
     from connections con
     join connectiontypes ct on con.connectiontypecode = ct.connectiontypecode
     join divinfo d on (con.divisionid = d.divisionid and con.subdivid = d.subdivid)
-    where connectionid = '{connection_id}'
+    where connectionid = :connection_id
     """
 
-    cursor.execute(connections_query)
+    cursor.execute(connections_query, {'connection_id': connection_id})
+    cursor.rowfactory = ConnectionRow
     connections_data = cursor.fetchone()
 
-    bill_query = f"""
+    bill_query = """
     select b.billissuedate, b.net_peakunits, b.net_offpeakunits, b.taxamount, b.fixedfee, b.arrears, b.duedate, b.totalamount_beforeduedate, b.totalamount_afterduedate
     from bill b
-    where b.connectionid = '{connection_id}'
-    and b.billingmonth = {month}
-    and b.billingyear = {year}
+    where b.connectionid = :connection_id
+    and b.billingmonth = :month
+    and b.billingyear = :year
     """
 
-    cursor.execute(bill_query)
+    cursor.execute(bill_query, {'connection_id': connection_id, 'month': month, 'year': year})
+    cursor.rowfactory = BillRow
     bill_data = cursor.fetchone()
 
-    tariffs_query1 = f"""
+    tariffs_query1 = """
     select net_peakunits, net_offpeakunits, peakamount, offpeakamount, billissuedate, import_peakunits, import_offpeakunits
     from bill
-    where connectionid = '{connection_id}'
+    where connectionid = :connection_id
     """
 
-    cursor.execute(tariffs_query1)
+    cursor.execute(tariffs_query1, {'connection_id': connection_id})
     tariffs_data1 = cursor.fetchone()
 
     billingdays = cursor.callfunc(
@@ -70,45 +81,45 @@ def get_bill_data(connection, customer_id, connection_id, month, year):
 
     billissuedate = tariffs_data1[4]
 
-    tariffs_query2 = f"""
+    tariffs_query2 = """
     select tarrifdescription, rateperunit
     from tariff
     join connections on connections.connectiontypecode = tariff.connectiontypecode
     where :billissuedate between tariff.startdate and tariff.enddate 
-    and {ahpc} between tariff.thresholdlow_perhour and tariff.thresholdhigh_perhour
-    and connections.connectionid = '{connection_id}'
+    and :ahpc between tariff.thresholdlow_perhour and tariff.thresholdhigh_perhour
+    and connections.connectionid = :connection_id
     """
 
     cursor.execute(tariffs_query2, {
-    'billissuedate': billissuedate})
+    'billissuedate': billissuedate, 'ahpc': ahpc, 'connection_id': connection_id})
     tariffs_data2 = cursor.fetchone()
 
-    tariffs_query3 = f"""
+    tariffs_query3 = """
     select tarrifdescription, rateperunit
     from tariff
     join connections on connections.connectiontypecode = tariff.connectiontypecode
     where (:billissuedate between startdate and enddate) 
-    and ({ahoc} between thresholdlow_perhour and thresholdhigh_perhour)
-    and connections.connectionid = '{connection_id}'
+    and (:ahoc between thresholdlow_perhour and thresholdhigh_perhour)
+    and connections.connectionid = :connection_id
     """
 
     cursor.execute(tariffs_query3, {
-    'billissuedate': billissuedate})
+    'billissuedate': billissuedate, 'ahoc': ahoc, 'connection_id': connection_id})
     tariffs_data3 = cursor.fetchone()
 
-    taxes_query = f"""
+    taxes_query = """
     select taxtype, rate
     from taxrates tr
     join connections c on c.connectiontypecode = tr.connectiontypecode
-    where c.connectionid = '{connection_id}'
+    where c.connectionid = :connection_id
     """
 
-    cursor.execute(taxes_query)
+    cursor.execute(taxes_query, {'connection_id': connection_id})
     taxes_data = cursor.fetchall()
 
     units_per_hour = (tariffs_data1[5] + tariffs_data1[6])/(billingdays * 24)
 
-    subsidy_query = f"""
+    subsidy_query = """
     SELECT
         s.subsidycode, s.rateperunit, sp.providername
     FROM
@@ -118,36 +129,37 @@ def get_bill_data(connection, customer_id, connection_id, month, year):
         JOIN CONNECTIONS C
         ON S.CONNECTIONTYPECODE = C.CONNECTIONTYPECODE
     WHERE
-        C.CONNECTIONID = '{connection_id}'
+        C.CONNECTIONID = :connection_id
         AND (:billissuedate BETWEEN S.STARTDATE
         AND S.ENDDATE)
     """
 
-    cursor.execute(subsidy_query, {'billissuedate': billissuedate})
+    cursor.execute(subsidy_query, {'billissuedate': billissuedate, 'connection_id': connection_id})
     subsidy_data = cursor.fetchall()
 
-    ff_query = f"""
+    ff_query = """
     select f.fixedchargetype, f.fixedfee
     from fixedcharges f
     join connections c on c.connectiontypecode = f.connectiontypecode
     where
-    C.CONNECTIONID = '{connection_id}'
+    C.CONNECTIONID = :connection_id
     and :billissuedate between f.startdate and f.enddate
     
     """
 
-    cursor.execute(ff_query, {'billissuedate': billissuedate})
+    cursor.execute(ff_query, {'billissuedate': billissuedate, 'connection_id': connection_id})
     ff_data = cursor.fetchall()
 
-    bills_prev_query = f"""
+    bills_prev_query = """
     select b.billingmonth, b.billingyear, b.totalamount_beforeduedate, b.duedate, p.paymentstatus
     from bill b
     join paymentdetails p on b.billid = p.billid
-    where b.connectionid = '{connection_id}'
+    where b.connectionid = :connection_id
     
     """
 
-    cursor.execute(bills_prev_query)
+    cursor.execute(bills_prev_query, {'connection_id': connection_id})
+    cursor.rowfactory = PrevBillRow
     bills_prev_data = cursor.fetchmany(size=10)
     
     return customer_data, connections_data, bill_data, tariffs_data1, tariffs_data2, tariffs_data3, taxes_data, subsidy_data, ff_data, bills_prev_data
\ No newline at end of file